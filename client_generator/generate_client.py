@@ -50,7 +50,6 @@ if __name__ == "__main__":
     parent = toml.load(Path("../pyproject.toml"))
 
     entries = [
-        ("project", "version"),
         ("project", "authors"),
         ("project", "license"),
         ("project", "urls"),
@@ -59,6 +58,7 @@ if __name__ == "__main__":
     for category, key in entries:
         child[category][key] = parent[category][key]
 
+    child["project"]["version"] = app.version
     child["project"]["description"] = "A client module for accessing the Trixel Management Service (API)"
 
     file = open(child_toml, "w")
@@ -0,0 +1,3 @@
+"""Version of the Trixel Management Service, also used as the package version."""
+
+__version__ = "0.2.0"
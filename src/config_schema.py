@@ -14,6 +14,8 @@ from pydantic import (
     NonNegativeInt,
     PositiveInt,
     SecretStr,
+    field_serializer,
+    field_validator,
     model_validator,
 )
 from pydantic_core import CoreSchema, core_schema
@@ -74,6 +76,8 @@ class TMSDatabaseConfig(BaseModel):
     port: Optional[int] = None
     db_name: Optional[str] = None
     use_sqlite: bool = False
+    pool_size: PositiveInt = 25
+    max_overflow: NonNegativeInt = 25
 
     @model_validator(mode="before")
     def validate_mutual_exlusion(data: Any) -> Any:
@@ -96,9 +100,22 @@ class TMSConfig(BaseModel):
     active: bool = Field(False)
     host: str
     api_token: SecretStr | None = Field(None)
-    delegations: list[TMSDelegation] = Field(list())
+    # Delegations indexed by their trixel id
+    delegations: dict[int, TMSDelegation] = Field(dict())
     database: Optional[TMSDatabaseConfig] = None
 
+    @field_validator("delegations", mode="before")
+    def index_delegations(data: Any) -> Any:
+        """Index delegations which are provided as list (e.g. by the TLS) by their trixel id."""
+        if isinstance(data, list):
+            return {delegation.trixel_id: delegation for delegation in data}
+        return data
+
+    @field_serializer("delegations")
+    def serialize_delegations(self, delegations: dict[int, TMSDelegation]) -> list[TMSDelegation]:
+        """Serialize delegations as list."""
+        return list(delegations.values())
+
 
 class Config(BaseSettings):
     """Base Model for global settings within the TOML configuration file."""
@@ -1,14 +1,35 @@
 """Global database wrappers."""
 
 from datetime import datetime, timedelta
+from typing import Callable
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlalchemy.dialects.sqlite.base import SQLiteDialect
+from sqlalchemy.engine import Dialect
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import measurement_station.model
 import model
 
 
+def get_conflict_ignoring_insert(dialect: Dialect) -> Callable | None:
+    """
+    Get the dialect specific insert construct which supports `ON CONFLICT DO NOTHING`.
+
+    Dialects are matched by type, since derived dialects (e.g. timescaledb) use a different dialect name.
+
+    :param dialect: dialect of the bind on which the insert is executed
+    :returns: insert construct of the dialect or None if the dialect does not support conflict handling
+    """
+    if isinstance(dialect, PGDialect):
+        return postgresql.insert
+    if isinstance(dialect, SQLiteDialect):
+        return sqlite.insert
+    return None
+
+
 async def init_measurement_type_enum(db: AsyncSession):
     """Initialize the measurement type reference enum table within the DB."""
     query = select(model.MeasurementType)
@@ -26,8 +47,15 @@ async def init_measurement_type_enum(db: AsyncSession):
 
     new_types = enum_types - existing_types
     if len(new_types) > 0:
-        for new_type in new_types:
-            db.add(model.MeasurementType(id=new_type[0], name=new_type[1]))
+        values = [{"id": id_, "name": name} for id_, name in new_types]
+
+        # Ignore types which have been inserted concurrently (e.g. by another TMS instance) if supported by the dialect
+        if insert_ := get_conflict_ignoring_insert(db.get_bind().dialect):
+            query = insert_(model.MeasurementType).values(values).on_conflict_do_nothing()
+        else:
+            query = insert(model.MeasurementType).values(values)
+
+        await db.execute(query)
         await db.commit()
 
 
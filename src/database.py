@@ -7,6 +7,7 @@ from sqlalchemy import URL, event
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from config_schema import Config, GlobalConfig
 
@@ -32,12 +33,21 @@ if db_config := config.tms_config.database:
 
 # Default local sqlite
 connect_args = {}
+pool_args = {}
 if DATABASE_URL is None:
     Path("./config").mkdir(parents=True, exist_ok=True)
     DATABASE_URL = "sqlite+aiosqlite:///./config/tms_sqlite.db"
     connect_args = {"check_same_thread": False}
+elif not db_config.use_sqlite:
+    # Re-use established connections to the database server across requests
+    pool_args = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": db_config.pool_size,
+        "max_overflow": db_config.max_overflow,
+        "pool_pre_ping": True,
+    }
 
-engine = create_async_engine(DATABASE_URL, connect_args=connect_args)
+engine = create_async_engine(DATABASE_URL, connect_args=connect_args, **pool_args)
 
 MetaSession = async_sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
 
@@ -48,11 +58,15 @@ Base = declarative_base()
 # source: https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#sqlite-foreign-keys
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
-    """Explicitly enable foreign key support (required for cascades)."""
+    """Explicitly enable foreign key support (required for cascades) and configure sqlite for faster writes."""
     database_config = config.tms_config.database
     if database_config is not None and database_config.use_sqlite:
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        # WAL journaling only requires fsyncs on checkpoints when combined with synchronous=NORMAL
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
         cursor.close()
 
 
@@ -3,11 +3,12 @@
 import asyncio
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from secrets import token_bytes
 
 import jwt
 from pydantic import UUID4, PositiveFloat, PositiveInt
-from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import except_columns
@@ -20,6 +21,30 @@ from . import model, schema
 lock_create_sensor_detail = asyncio.Lock()
 
 
+@lru_cache(maxsize=4096)
+def _get_ms_uuid(jwt_token: str) -> UUID4:
+    """
+    Get the measurement station uuid contained within a token without verifying its signature.
+
+    :param jwt_token: user provided token
+    :return: measurement station uuid contained within the token
+    """
+    unverified_payload = jwt.decode(jwt_token, options={"verify_signature": False}, algorithms=["HS256"])
+    return uuid.UUID(hex=unverified_payload["ms_uuid"])
+
+
+@lru_cache(maxsize=4096)
+def _verify_signature(jwt_token: str, token_secret: bytes) -> None:
+    """
+    Verify the signature of a token, results are cached since they only depend on the token and secret.
+
+    :param jwt_token: user provided token
+    :param token_secret: secret of the measurement station to which the token belongs
+    :raises PyJWTError: if the signature is invalid
+    """
+    jwt.decode(jwt_token, token_secret, algorithms=["HS256"])
+
+
 async def verify_ms_token(db: AsyncSession, jwt_token: bytes) -> UUID4:
     """
     Check measurement station authentication token validity.
@@ -29,11 +54,10 @@ async def verify_ms_token(db: AsyncSession, jwt_token: bytes) -> UUID4:
     :raises PermissionError: if the provided token does not exist or is invalid
     """
     try:
-        unverified_payload = jwt.decode(jwt_token, options={"verify_signature": False}, algorithms=["HS256"])
-        uuid_: UUID4 = uuid.UUID(hex=unverified_payload["ms_uuid"])
+        uuid_: UUID4 = _get_ms_uuid(jwt_token)
         query = select(model.MeasurementStation.token_secret).where(model.MeasurementStation.uuid == uuid_)
         if token_secret := (await db.execute(query)).scalar_one_or_none():
-            jwt.decode(jwt_token, token_secret, algorithms=["HS256"])
+            _verify_signature(jwt_token, token_secret)
             return uuid_
     except jwt.PyJWTError:
         raise PermissionError("Invalid MS authentication token.")
@@ -241,25 +265,28 @@ async def insert_sensor_updates(db: AsyncSession, ms_uuid: UUID4, updates: schem
     :raises ValueError: if multiple updates are included for a single sensor
     """
     sensor_ids = list()
-    clauses = list()
+    values = list()
     for measurements in updates.values():
         for measurement in measurements:
-            clauses.append(model.Sensor.id == measurement.sensor_id)
             sensor_ids.append(measurement.sensor_id)
-
-            new_sensor_measurement: model.SensorMeasurement = model.SensorMeasurement(
-                time=(
-                    measurement.timestamp
-                    if isinstance(measurement.timestamp, datetime)
-                    else datetime.fromtimestamp(measurement.timestamp)
-                ),
-                measurement_station_uuid=ms_uuid,
-                sensor_id=measurement.sensor_id,
-                value=measurement.value,
+            values.append(
+                {
+                    "time": (
+                        measurement.timestamp
+                        if isinstance(measurement.timestamp, datetime)
+                        else datetime.fromtimestamp(measurement.timestamp)
+                    ),
+                    "measurement_station_uuid": ms_uuid,
+                    "sensor_id": measurement.sensor_id,
+                    "value": measurement.value,
+                }
             )
-            db.add(new_sensor_measurement)
 
-    query = select(model.Sensor.id).where(model.Sensor.measurement_station_uuid == ms_uuid).where(or_(False, *clauses))
+    query = (
+        select(model.Sensor.id)
+        .where(model.Sensor.measurement_station_uuid == ms_uuid)
+        .where(model.Sensor.id.in_(sensor_ids))
+    )
     results = (await db.execute(query)).all()
     valid_sensors = set([x[0] for x in results])
 
@@ -269,6 +296,9 @@ async def insert_sensor_updates(db: AsyncSession, ms_uuid: UUID4, updates: schem
     if len(sensor_ids) != len(set(sensor_ids)):
         raise ValueError("Only one update per sensor allowed!")
 
+    # Insert all measurements with a single multi-row statement
+    if len(values) > 0:
+        await db.execute(insert(model.SensorMeasurement).values(values))
     await db.commit()
 
 
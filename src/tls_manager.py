@@ -1,16 +1,17 @@
 """Wrapping class responsible for TLS related communication."""
 
 import asyncio
-import importlib
+import importlib.metadata
+import logging
 import os
-import signal
+import re
 import sys
+import time
 from http import HTTPStatus
 from pathlib import Path
 
-import packaging.version
 import toml
-from httpx import ConnectError
+from httpx import ConnectError, TransportError
 from pydantic import NonNegativeInt
 from trixellookupclient import Client
 from trixellookupclient.api.trixel_information import (
@@ -50,13 +51,22 @@ from model import MeasurementTypeEnum
 from schema import TrixelID
 
 api_version = importlib.metadata.version("trixellookupclient")
+api_major_version = int(re.match(r"\d+", api_version).group())
 logger = get_logger(__name__)
 MAX_CONNECTION_ATTEMPTS = 10
 
+# Prevent modification of the local config file during tests or if requested via the environment
+_SKIP_CONFIG_UPDATE = "pytest" in sys.modules or os.environ.get("TMS_SKIP_CONFIG_WRITE") == "1"
+
+# Number of consecutive failed TLS updates after which further updates fail fast
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5
+# Time in seconds after which a single probe request is sent to a TLS which was considered unavailable
+CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
 
 def update_config_file(config: Config):
     """Update the TOML config partially with information from the current config."""
-    if "pytest" in sys.modules:
+    if _SKIP_CONFIG_UPDATE:
         return
 
     file = Path("config/config.toml")
@@ -65,9 +75,11 @@ def update_config_file(config: Config):
     existing_config["tms_config"]["active"] = config.tms_config.active
     existing_config["tms_config"]["api_token"] = config.tms_config.api_token.get_secret_value()
 
-    new_config = open(file, "w")
-    toml.dump(existing_config, new_config)
-    new_config.close()
+    # Write to a temporary file first, so that the existing config is not corrupted if writing fails
+    temporary_file = file.with_suffix(".toml.tmp")
+    with open(temporary_file, "w", buffering=64 * 1024) as new_config:
+        toml.dump(existing_config, new_config)
+    os.replace(temporary_file, file)
 
 
 class TLSManager:
@@ -80,40 +92,83 @@ class TLSManager:
         # Assume the TMS is deactivated until synchronized with the TLS.
         self.config.tms_config.active = False
 
-        secure = "" if self.config.tls_config.use_ssl is False else "s"
-        self.tls_client = Client(
-            base_url=f"http{secure}://{self.config.tls_config.host}/v{packaging.version.Version(api_version).major}/"
-        )
+        tls_config = self.config.tls_config
+        secure = "" if tls_config.use_ssl is False else "s"
+        self.tls_client = Client(base_url=f"http{secure}://{tls_config.host}/v{api_major_version}/")
+
+        # Plain text authentication token, lazily retrieved from the config
+        self._api_token: str | None = None
+
+        # Set once a critical error occurred, after which the TMS should shut down
+        self.shutdown_event = asyncio.Event()
+
+        # Circuit breaker state for (non-critical) TLS updates
+        self._consecutive_failures: int = 0
+        self._circuit_open_until: float = 0
+
+    def _get_api_token(self) -> str:
+        """Get the authentication token which is used at the TLS."""
+        if self._api_token is None:
+            self._api_token = self.config.tms_config.api_token.get_secret_value()
+        return self._api_token
+
+    def _check_circuit(self):
+        """
+        Fail fast if the TLS is considered to be unavailable.
+
+        Once the reset timeout has passed, a single probe request is allowed while other requests keep failing fast.
+        The circuit is closed if the TLS responds to the probe without a server error, otherwise it is re-opened.
+
+        :raises TLSError: if the circuit breaker is open
+        """
+        if self._consecutive_failures < CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            return
+
+        now = time.monotonic()
+        if now < self._circuit_open_until:
+            raise TLSError("TLS unavailable, skipping request!")
+        self._circuit_open_until = now + CIRCUIT_BREAKER_RESET_TIMEOUT
+
+    def _record_failure(self):
+        """Record a failed TLS request, opens the circuit breaker after too many consecutive failures."""
+        self._consecutive_failures += 1
+        if self._consecutive_failures >= CIRCUIT_BREAKER_FAILURE_THRESHOLD:
+            self._circuit_open_until = time.monotonic() + CIRCUIT_BREAKER_RESET_TIMEOUT
 
     async def start(self):
         """Start the TLSManager, which registers the TMS at the TLS and retrieves it's configuration."""
+        tms_config = self.config.tms_config
         retries = 0
         while True:
             try:
                 await asyncio.sleep(0.1)
 
-                if self.config.tms_config.api_token is None:
+                if tms_config.api_token is None:
                     await self.register()
 
-                await self.sync_tls_config()
-                await self.fetch_delegations()
+                # Detail synchronization and delegation retrieval only depend on the (known) TMS id
+                results = await asyncio.gather(self.sync_tls_config(), self.fetch_delegations(), return_exceptions=True)
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
 
                 logger.info("Synchronized with TLS.")
-                delegation_detail = [
-                    (x.trixel_id, "exclude" if x.exclude else "include") for x in self.config.tms_config.delegations
-                ]
-                logger.info(f"Trixel-delegations: {delegation_detail}")
+                if logger.isEnabledFor(logging.INFO):
+                    delegation_detail = [
+                        (x.trixel_id, "exclude" if x.exclude else "include") for x in tms_config.delegations.values()
+                    ]
+                    logger.info(f"Trixel-delegations: {delegation_detail}")
                 return
             except ConnectError as e:
                 await asyncio.sleep(5)
                 retries += 1
                 if retries >= MAX_CONNECTION_ATTEMPTS:
                     logger.critical(e)
-                    os.kill(os.getpid(), signal.SIGINT)
+                    self.shutdown_event.set()
                     return
             except (TLSCriticalError, Exception) as e:
                 logger.critical(e)
-                os.kill(os.getpid(), signal.SIGINT)
+                self.shutdown_event.set()
                 return
 
     async def register(self):
@@ -129,15 +184,17 @@ class TLSManager:
 
         result: TrixelManagementServerCreate = result.parsed
 
-        self.config.tms_config.id = result.id
-        self.config.tms_config.active = result.active
-        self.config.tms_config.api_token = result.token
+        tms_config.id = result.id
+        tms_config.active = result.active
+        tms_config.api_token = result.token
+        self._api_token = None
         update_config_file(config=self.config)
 
     async def sync_tls_config(self):
         """Synchronize TMS details with the TLS."""
         logger.debug("Fetching TMS details")
         tms_config = self.config.tms_config
+        self._api_token = None
 
         if tms_config.id is None:
             raise TLSCriticalError("Own TMS ID unknown!")
@@ -152,16 +209,15 @@ class TLSManager:
 
         detail_result: TrixelManagementServer = detail_result.parsed
 
-        self.config.tms_config.id = detail_result.id
-        self.config.tms_config.active = detail_result.active
-        tms_config = self.config.tms_config
+        tms_config.id = detail_result.id
+        tms_config.active = detail_result.active
 
         if not tms_config.active:
             raise TLSCriticalError("TMS is deactivated by the TLS.")
 
         # Verify that the local authentication token is still valid
         token_validation_result: Response = await validate_token.asyncio_detailed(
-            client=self.tls_client, tms_id=tms_config.id, token=tms_config.api_token.get_secret_value()
+            client=self.tls_client, tms_id=tms_config.id, token=self._get_api_token()
         )
         if token_validation_result.status_code == HTTPStatus.UNAUTHORIZED:
             raise TLSCriticalError("TMS authentication token invalid!")
@@ -176,14 +232,14 @@ class TLSManager:
                 client=self.tls_client,
                 tms_id=tms_config.id,
                 host=tms_config.host,
-                token=tms_config.api_token.get_secret_value(),
+                token=self._get_api_token(),
             )
             if detail_result.status_code != HTTPStatus.OK:
                 raise TLSCriticalError("TMS update-details", detail_result)
             detail_result: TrixelManagementServerCreate = detail_result.parsed
 
-            self.config.tms_config.id = detail_result.id
-            self.config.tms_config.active = detail_result.active
+            tms_config.id = detail_result.id
+            tms_config.active = detail_result.active
 
         update_config_file(config=self.config)
 
@@ -213,17 +269,28 @@ class TLSManager:
         :param type_: The measurement type for which the sensor count is updated
         :param updates: A dict which contains the new sensor count for a given set of trixels
         :return: updated trixel map entry
-        :raises TLSError: if updating the value failed
+        :raises TLSError: if updating the value failed or the TLS is considered unavailable
         :raises TLSCriticalError: if authentication failed
         """
+        self._check_circuit()
         body: BatchUpdateSensorCount = BatchUpdateSensorCount.from_dict(updates)
 
-        result: Response[TrixelMapUpdate] = await batch_update_trixel_map_entry.asyncio_detailed(
-            client=self.tls_client,
-            type=type_,
-            body=body,
-            token=self.config.tms_config.api_token.get_secret_value(),
-        )
+        try:
+            result: Response[TrixelMapUpdate] = await batch_update_trixel_map_entry.asyncio_detailed(
+                client=self.tls_client,
+                type=type_,
+                body=body,
+                token=self._get_api_token(),
+            )
+        except TransportError as e:
+            self._record_failure()
+            raise TLSError("TMS failed to reach TLS during trixel map update!", e)
+
+        if result.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            self._record_failure()
+        else:
+            # The TLS is available, even if it rejected this specific request
+            self._consecutive_failures = 0
 
         if result.status_code == HTTPStatus.UNAUTHORIZED:
             raise TLSCriticalError("Authentication failed during trixel map update!")
@@ -233,7 +300,7 @@ class TLSManager:
 
         return result.parsed
 
-    async def get_trixel_map_overview(self) -> dict[MeasurementTypeEnum, set[int]]:
+    async def get_trixel_map_overview(self) -> dict[MeasurementTypeEnum, frozenset[int]]:
         """
         Retrieve trixels which have at least one measurement station according to the TLS.
 
@@ -241,26 +308,27 @@ class TLSManager:
 
         :returns: dict containing all trixels which have at least one sensor for each measurement type
         """
-        # TODO: does not consider delegation exclusion
+        # TODO: does not consider excluded delegations which are located within included delegations
         delegations = self.config.tms_config.delegations
 
         if len(delegations) == 0:
             raise TLSCriticalError("Failed to fetch trixel sensor count overview. Delegations unknown.")
 
-        overview: dict[MeasurementTypeEnum, set[int]] = dict()
-        for type_ in MeasurementTypeEnum:
-            for delegation in delegations:
+        included_delegations = tuple(delegation for delegation in delegations.values() if not delegation.exclude)
+        types = tuple(MeasurementTypeEnum)
 
-                if delegation.exclude is False:
-                    result: Response[list[int]] = await get_sub_trixels.asyncio_detailed(
-                        client=self.tls_client,
-                        types=[type_],
-                        trixel_id=delegation.trixel_id,
-                    )
+        overview: dict[MeasurementTypeEnum, set[int]] = dict()
+        for type_ in types:
+            for delegation in included_delegations:
+                result: Response[list[int]] = await get_sub_trixels.asyncio_detailed(
+                    client=self.tls_client,
+                    types=[type_],
+                    trixel_id=delegation.trixel_id,
+                )
 
                 if result.status_code != HTTPStatus.OK:
                     raise TLSCriticalError("TMS fetch trixel overview failed!", result)
 
                 overview.setdefault(type_, set()).update(result.parsed)
 
-        return overview
+        return {type_: frozenset(trixels) for type_, trixels in overview.items()}
@@ -1,15 +1,21 @@
 """Entry point for the Trixel Management Service API."""
 
+import argparse
 import asyncio
-import importlib
+import logging
+import re
+import signal
+import sys
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from http import HTTPStatus
 from typing import Annotated, List
 
-import packaging.version
 import uvicorn
-from fastapi import Depends, FastAPI, Path, Query
+from fastapi import APIRouter, Depends, FastAPI, Path, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import NonNegativeInt
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.responses import Response
@@ -17,10 +23,11 @@ from starlette.responses import Response
 import crud
 import model
 import schema
+from _version import __version__ as api_version
 from common import is_active
 from config_schema import Config, GlobalConfig
 from crud import init_measurement_type_enum
-from database import engine, get_db
+from database import MetaSession, engine, get_db
 from logging_helper import get_logger
 from measurement_station.measurement_station import TAG_MEASUREMENT_STATION, TAG_TRIXELS
 from measurement_station.measurement_station import router as measurement_station_router
@@ -29,7 +36,9 @@ from privatizer.manager import PrivacyManager
 from schema import TrixelID
 from tls_manager import TLSManager
 
-api_version = importlib.metadata.version("trixelmanagementserver")
+api_major_version = int(re.match(r"\d+", api_version).group())
+# uvloop is required wherever it is supported, an explicit choice prevents silent fallbacks to the asyncio loop
+event_loop = "asyncio" if sys.platform == "win32" else "uvloop"
 config: Config = GlobalConfig.config
 
 
@@ -37,72 +46,87 @@ logger = get_logger(__name__)
 
 openapi_tags = [{"name": TAG_MEASUREMENT_STATION}, {"name": TAG_TRIXELS}]
 
+# Pre-serialized bodies of constant responses
+ping_content = schema.Ping().model_dump_json().encode()
+version_content = schema.Version(version=api_version).model_dump_json().encode()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifespan actions executed before and after FastAPI."""
+# Body-less response which is shared among requests, it is never mutated after creation
+active_response = Response(status_code=HTTPStatus.OK)
+
+
+async def init_db():
+    """Create missing relations and initialize the measurement type enum relation."""
     async with engine.begin() as conn:
         await conn.run_sync(model.Base.metadata.create_all)
     async for db in get_db():
         await init_measurement_type_enum(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan actions executed before and after FastAPI."""
+    await init_db()
     asyncio.create_task(app.tls_manger.start())
+    asyncio.create_task(shutdown_on_critical_error(app))
     asyncio.create_task(app.privacy_manager.periodic_processing())
     asyncio.create_task(purge_sensor_data_job())
     yield
 
 
-app = FastAPI(
-    title="Trixel Management Service",
-    summary="""
-            Manages Trixels and participating measurement stations to provide anonymized environmental observations
-            for trixels.
-            """,
-    version=api_version,
-    root_path=f"/v{packaging.version.Version(api_version).major}",
-    openapi_tags=openapi_tags,
-    lifespan=lifespan,
-)
-app.include_router(measurement_station_router)
-app.tls_manger = TLSManager()
+router = APIRouter()
 
-privatizer_class = get_privatizer(config.privatizer_config.privatizer)
-logger.info(f"Using {privatizer_class.__name__} with the following configuration: {config.privatizer_config}!")
-app.privacy_manager = PrivacyManager(
-    tls_manager=app.tls_manger, privatizer_class=get_privatizer(config.privatizer_config.privatizer)
-)
+
+async def shutdown_on_critical_error(app: FastAPI):
+    """Gracefully stop the server once the TLSManager encountered a critical error."""
+    await app.tls_manger.shutdown_event.wait()
+    logger.critical("Shutting down TMS.")
+
+    if server := getattr(app.state, "server", None):
+        server.should_exit = True
+    else:
+        # Server not started via main (e.g. uvicorn cli during development), fall back to uvicorn's signal handling
+        signal.raise_signal(signal.SIGINT)
 
 
 async def purge_sensor_data_job():
     """Delete old sensor data periodically."""
+    # Use a monotonic schedule, so that long-running purges do not delay subsequent purges
+    next_run = time.monotonic()
     while True:
-        async for db in get_db():
+        async with MetaSession() as db:
             age = config.sensor_data_keep_interval
-            logger.info(f"Purging sensor data older than: {datetime.now() - age}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Purging sensor data older than: {datetime.now() - age}")
             await crud.purge_old_sensor_data(db, age)
-        await asyncio.sleep(config.sensor_data_purge_interval.total_seconds())
+
+        # Skip missed runs after stalls or overruns instead of purging repeatedly until the schedule caught up
+        next_run = max(next_run + config.sensor_data_purge_interval.total_seconds(), time.monotonic())
+        await asyncio.sleep(max(0, next_run - time.monotonic()))
 
 
-@app.get(
+@router.get(
     "/ping",
     name="Ping",
     summary="ping ... pong",
+    response_model=schema.Ping,
 )
-async def ping() -> schema.Ping:
+async def ping() -> Response:
     """Return a basic ping message."""
-    return schema.Ping()
+    return Response(content=ping_content, media_type="application/json")
 
 
-@app.get(
+@router.get(
     "/version",
     name="Version",
     summary="Get the precise current semantic version.",
+    response_model=schema.Version,
 )
-async def get_semantic_version() -> schema.Version:
+async def get_semantic_version() -> Response:
     """Get the precise version of the currently running API."""
-    return schema.Version(version=api_version)
+    return Response(content=version_content, media_type="application/json")
 
 
-@app.get(
+@router.get(
     "/active",
     name="is_active",
     summary="Get the active status of this TMS.",
@@ -114,13 +138,13 @@ async def get_semantic_version() -> schema.Version:
 )
 async def get_active() -> Response:
     """Get the active status of this TMS."""
-    return Response(status_code=HTTPStatus.OK)
+    return active_response
 
 
 # TODO: add (authenticated) /delegations PUT endpoint for delegation updates from the TLS
 
 
-@app.get(
+@router.get(
     "/trixel/{trixel_id}",
     name="Get Observations",
     summary="Gets the current environmental observations for a trixel.",
@@ -147,9 +171,58 @@ async def get_observation(
     return await crud.get_observations(db, trixel_id, types, age=None if age is None else timedelta(seconds=int(age)))
 
 
+def create_app(config: Config) -> FastAPI:
+    """
+    Create the TMS app including the TLS- and privacy-manager it depends on.
+
+    The TMS components (endpoints, DB, TLS- and privacy-manager) read the global configuration, thus only a single
+    TMS app can be used per process.
+
+    :param config: configuration from which the privatizer is selected, must be the global configuration
+    :returns: FastAPI app which serves the TMS API
+    """
+    app = FastAPI(
+        title="Trixel Management Service",
+        summary="""
+            Manages Trixels and participating measurement stations to provide anonymized environmental observations
+            for trixels.
+            """,
+        version=api_version,
+        root_path=f"/v{api_major_version}",
+        openapi_tags=openapi_tags,
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
+    app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+    app.include_router(measurement_station_router)
+    app.include_router(router)
+    app.tls_manger = TLSManager()
+
+    privatizer_class = get_privatizer(config.privatizer_config.privatizer)
+    logger.info(f"Using {privatizer_class.__name__} with the following configuration: {config.privatizer_config}!")
+    app.privacy_manager = PrivacyManager(tls_manager=app.tls_manger, privatizer_class=privatizer_class)
+    return app
+
+
+app = create_app(config)
+
+
 def main() -> None:
     """Entry point for cli module invocations."""
-    uvicorn.main("trixelmanagementserver:app")
+    # Only a subset of the uvicorn CLI is supported, other options require `uvicorn trixelmanagementserver:app`
+    parser = argparse.ArgumentParser(
+        description="Trixel Management Service",
+        epilog="Other uvicorn options require starting the TMS via `uvicorn trixelmanagementserver:app`.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to which the TMS binds")
+    parser.add_argument("--port", type=int, default=8000, help="port to which the TMS binds")
+    args = parser.parse_args()
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=args.host, port=args.port, loop=event_loop, http="httptools", interface="asgi3")
+    )
+    app.state.server = server
+    server.run()
 
 
 if __name__ == "__main__":
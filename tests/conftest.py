@@ -1,10 +1,11 @@
 """Pytest configuration, fixtures and db-testing-preamble."""
 
 import asyncio
+import uuid
 from typing import Any, AsyncGenerator
 
 import pytest
-from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 from trixellookupclient.models.tms_delegation import TMSDelegation
@@ -12,6 +13,7 @@ from trixellookupclient.models.tms_delegation import TMSDelegation
 from config_schema import Config, GlobalConfig, TestConfig
 from crud import init_measurement_type_enum
 from database import Base
+from model import MeasurementType
 from tls_manager import TLSManager
 from trixelmanagementserver import app, get_db
 
@@ -34,46 +36,37 @@ async def override_get_db() -> AsyncGenerator[AsyncSession, Any]:
 
 
 @pytest.fixture(scope="function", name="db")
-async def get_db_session():
-    """Get a database session which can be used in tests."""
-    async for db in override_get_db():
-        return db
+async def get_db_session() -> AsyncGenerator[AsyncSession, Any]:
+    """
+    Get a database session which can be used in tests to inspect the DB.
 
+    Changes are not rolled back, the DB is cleared by `reset_db` instead.
+    """
+    async with TestingSessionLocal() as db:
+        yield db
 
-async def reset_db():
-    """Drop all tables within the DB and re-instantiates the model."""
+
+async def create_db():
+    """Instantiate the model within the DB and initialize/synchronize enum tables."""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
 
+    async for db in override_get_db():
+        await init_measurement_type_enum(db)
 
-def prepare_db():
-    """Set up empty temporary test database."""
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(reset_db())
-
-    TestingSessionLocal = async_sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
-
-    async def override_get_db() -> AsyncGenerator[AsyncSession, Any]:
-        """Override the default database session retrieval with the test environment db."""
-        async with TestingSessionLocal() as db:
-            yield db
-
-    app.dependency_overrides[get_db] = override_get_db
-
-    async def init_enums():
-        """Initialize/synchronize enum tables within the DB."""
-        async for db in override_get_db():
-            await init_measurement_type_enum(db)
 
-    loop.run_until_complete(init_enums())
+async def reset_db():
+    """Remove all entries from the DB, except for enum tables."""
+    async with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name != MeasurementType.__tablename__:
+                await conn.execute(table.delete())
 
 
-@pytest.fixture(scope="function")
-def empty_db():
-    """Reset the test database before test execution."""
-    prepare_db()
-    yield
+@pytest.fixture(scope="module")
+async def empty_db():
+    """Reset the test database once before the tests of a module are executed."""
+    await reset_db()
 
 
 @pytest.fixture(scope="function", name="config")
@@ -82,10 +75,14 @@ def get_config() -> Config:
     return GlobalConfig.config
 
 
+# Settings are only parsed once, tests receive copies which can be modified freely
+test_config = TestConfig()
+
+
 @pytest.fixture(scope="function", name="new_config")
 def get_new_config() -> Config:
     """Fixture which returns a new test configuration."""
-    GlobalConfig.config = TestConfig()
+    GlobalConfig.config = test_config.model_copy(deep=True)
     return GlobalConfig.config
 
 
@@ -101,14 +98,41 @@ def preset_tls_manager(new_tls_manager: TLSManager) -> TLSManager:
     new_tls_manager.config.tms_config.id = 1
     new_tls_manager.config.tms_config.active = True
     new_tls_manager.config.tms_config.api_token = "Token"
-    new_tls_manager.config.tms_config.delegations = list()
+    new_tls_manager.config.tms_config.delegations = dict()
 
     # Mock delegation of root nodes
     for i in range(8, 16):
-        new_tls_manager.config.tms_config.delegations.append(TMSDelegation(tms_id=1, trixel_id=i, exclude=False))
+        new_tls_manager.config.tms_config.delegations[i] = TMSDelegation(tms_id=1, trixel_id=i, exclude=False)
 
     return new_tls_manager
 
 
-prepare_db()
-client = TestClient(app)
+@pytest.fixture(scope="function")
+async def measurement_station(empty_db, preset_tls_manager: TLSManager) -> AsyncGenerator[dict[str, Any], Any]:
+    """
+    Fixture which registers a new measurement station and yields the details returned on creation.
+
+    The measurement station and related entities are removed afterwards, which keeps the DB clean for other tests.
+    """
+    response = await client.post("/measurement_station?k_requirement=4")
+    data = response.json()
+    yield data
+    await client.delete("/measurement_station", headers={"token": data["token"]})
+
+
+@pytest.fixture(scope="function")
+def ms_token(measurement_station: dict[str, Any]) -> str:
+    """Fixture which returns the authentication token of a new measurement station."""
+    return measurement_station["token"]
+
+
+@pytest.fixture(scope="function")
+def ms_uuid(measurement_station: dict[str, Any]) -> uuid.UUID:
+    """Fixture which returns the uuid of a new measurement station, as returned on creation."""
+    return uuid.UUID(measurement_station["uuid"])
+
+
+asyncio.run(create_db())
+app.dependency_overrides[get_db] = override_get_db
+# The app is invoked in-process within the test's event loop, no sync-to-async bridge or connection is required
+client = AsyncClient(transport=ASGITransport(app=app, raise_app_exceptions=False), base_url="http://testserver")
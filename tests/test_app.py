@@ -3,35 +3,60 @@
 import pytest
 from conftest import client
 from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.dialects.postgresql.asyncpg import PGDialect_asyncpg
+from sqlalchemy.dialects.sqlite.aiosqlite import SQLiteDialect_aiosqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy_timescaledb.dialect import TimescaledbAsyncpgDialect
 
 import model
+from crud import get_conflict_ignoring_insert
 
 
-@pytest.mark.order(100)
-def test_ping():
+async def test_ping():
     """Test ping endpoint."""
-    response = client.get("/ping")
+    response = await client.get("/ping")
     assert response.status_code == 200
     assert response.json() == {"ping": "pong"}
 
 
-@pytest.mark.order(100)
-def test_version():
+async def test_version():
     """Test version endpoint."""
-    response = client.get("/version")
+    response = await client.get("/version")
     assert response.status_code == 200
     assert "version" in response.json()
 
 
-@pytest.mark.order(100)
-@pytest.mark.asyncio
+async def test_response_compression():
+    """Test that large responses are compressed."""
+    response = await client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+
+
 async def test_measurement_type_enums(empty_db, db: AsyncSession):
     """Test if the measurement enum relation contains entries."""
-    db = await db
     query = select(model.MeasurementType.name)
     types_ = (await db.execute(query)).scalars().all()
 
     for enum in model.MeasurementTypeEnum:
         assert enum.value in types_
-    await db.aclose()
+
+
+@pytest.mark.parametrize(
+    "dialect,expected_insert",
+    (
+        pytest.param(SQLiteDialect_aiosqlite(), sqlite.insert, id="sqlite"),
+        pytest.param(PGDialect_asyncpg(), postgresql.insert, id="postgresql"),
+        pytest.param(TimescaledbAsyncpgDialect(), postgresql.insert, id="timescaledb"),
+        pytest.param(mysql.dialect(), None, id="mysql"),
+    ),
+)
+def test_conflict_ignoring_insert(dialect, expected_insert):
+    """Test that the insert construct is selected by dialect type, including derived dialects."""
+    insert_ = get_conflict_ignoring_insert(dialect)
+    assert insert_ is expected_insert
+
+    if insert_ is not None:
+        query = insert_(model.MeasurementType).values([{"id": 0, "name": "test"}]).on_conflict_do_nothing()
+        assert "ON CONFLICT DO NOTHING" in str(query.compile(dialect=dialect))
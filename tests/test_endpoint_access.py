@@ -0,0 +1,49 @@
+"""Tests related to access restrictions which apply to multiple endpoints."""
+
+from http import HTTPStatus
+from typing import Callable
+
+import pytest
+from conftest import client
+
+from tls_manager import TLSManager
+
+
+@pytest.mark.parametrize(
+    "method,endpoint",
+    (
+        (client.put, "/measurement_station"),
+        (client.delete, "/measurement_station"),
+        (client.get, "/measurement_station"),
+        (client.post, "/measurement_station/sensor"),
+        (client.delete, "/measurement_station/sensor/0"),
+        (client.get, "/measurement_station/sensor/0"),
+        (client.put, "/trixel/1/update/0"),
+        (client.put, "/trixel/update"),
+    ),
+)
+async def test_endpoints_invalid_token(method: Callable, endpoint: str, preset_tls_manager: TLSManager):
+    """Test endpoints with invalid token."""
+    response = await method(endpoint, headers={"token": "fake_token"})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED, response.text
+
+
+@pytest.mark.parametrize(
+    "method,endpoint",
+    (
+        (client.post, "/measurement_station"),
+        (client.put, "/measurement_station"),
+        (client.delete, "/measurement_station"),
+        (client.get, "/measurement_station"),
+        (client.get, "/measurement_station/sensors"),
+        (client.post, "/measurement_station/sensor"),
+        (client.delete, "/measurement_station/sensor/0"),
+        (client.get, "/measurement_station/sensor/0"),
+        (client.put, "/trixel/1/update/0"),
+        (client.put, "/trixel/update"),
+    ),
+)
+async def test_add_ms_inactive(method: Callable, endpoint: str, empty_db, new_tls_manager: TLSManager):
+    """Test endpoints while TMS inactive."""
+    response = await method(endpoint)
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE, response.text
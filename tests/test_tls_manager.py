@@ -1,49 +1,66 @@
 """Tests related to the TLS Manager."""
 
-import importlib
+import time
 from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Generator, Iterable
 from urllib.parse import urlencode
 
-import packaging.version
 import pytest
 import respx
+from conftest import test_config
 from httpx import ConnectError, Response
+from trixellookupclient.api.trixel_information import (
+    batch_update_trixel_count_trixel_sensor_count_type_put as batch_update_trixel_map_entry,
+)
 from trixellookupclient.models.tms_delegation import TMSDelegation
 
-from config_schema import Config, TestConfig
-from exception import TLSCriticalError
-from tls_manager import TLSManager
+from config_schema import Config
+from exception import TLSCriticalError, TLSError
+from model import MeasurementTypeEnum
+from tls_manager import CIRCUIT_BREAKER_FAILURE_THRESHOLD, TLSManager, api_major_version
 
-pytest_plugins = ("pytest_asyncio",)
+tls_prefix = f"https://{test_config.tls_config.host}/v{api_major_version}"
+host_query = urlencode({"host": test_config.tms_config.host})
 
-api_version = importlib.metadata.version("trixellookupclient")
-tls_prefix = f"https://{TestConfig().tls_config.host}/v{packaging.version.Version(api_version).major}"
+
+async def expect_critical_error(
+    route: respx.Route, status_codes: Iterable[HTTPStatus], call: Callable[[], Awaitable[Any]]
+) -> None:
+    """
+    Assert that a critical error is raised for each of the given TLS response status codes.
+
+    :param route: the mocked TLS route which is requested by the call
+    :param status_codes: status codes with which the TLS responds
+    :param call: the TLS manager method under test
+    """
+    for status_code in status_codes:
+        route.reset()
+        route.mock(Response(status_code=status_code, json={}))
+
+        with pytest.raises(TLSCriticalError):
+            await call()
+
+        assert route.called
 
 
-@pytest.mark.order(200)
 def test_read_config(new_config: Config):
     """Test that the test configuration was loaded correctly."""
     assert new_config.tls_config.host == "sausage.dog.local"
     assert new_config.tms_config.host == "wiener.dog.local"
 
 
-@pytest.mark.asyncio
-@pytest.mark.order(200)
 async def test_fetch_delegation_invalid_config(new_tls_manager: TLSManager):
     """Test fetching delegations when the TLS is unreachable."""
     with pytest.raises(ConnectError):
         await new_tls_manager.fetch_delegations()
 
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.order(200)
-async def test_fetch_delegations(preset_tls_manager: TLSManager):
+async def test_fetch_delegations(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test trixel delegation retrieval."""
     manager = preset_tls_manager
     config = manager.config
 
-    delegation_request = respx.get(f"{tls_prefix}/TMS/1/delegations").mock(
+    delegation_request = respx_mock.get(f"{tls_prefix}/TMS/1/delegations").mock(
         return_value=Response(
             status_code=HTTPStatus.OK,
             json=[
@@ -54,39 +71,23 @@ async def test_fetch_delegations(preset_tls_manager: TLSManager):
 
     await manager.fetch_delegations()
     assert delegation_request.called
-    assert config.tms_config.delegations[0] == TMSDelegation(tms_id=1, trixel_id=8, exclude=False)
+    assert config.tms_config.delegations[8] == TMSDelegation(tms_id=1, trixel_id=8, exclude=False)
 
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.parametrize("status_code", {HTTPStatus.NOT_FOUND, HTTPStatus.UNPROCESSABLE_ENTITY})
-@pytest.mark.order(200)
-async def test_fetch_delegations_wrong_trixel(status_code: int, preset_tls_manager: TLSManager):
+async def test_fetch_delegations_wrong_trixel(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test delegation retrieval with an invalid tms id."""
-    manager = preset_tls_manager
-
-    request = respx.get(f"{tls_prefix}/TMS/1/delegations").mock(
-        Response(
-            status_code=status_code,
-            json={},
-        )
+    route = respx_mock.get(f"{tls_prefix}/TMS/1/delegations")
+    await expect_critical_error(
+        route, (HTTPStatus.NOT_FOUND, HTTPStatus.UNPROCESSABLE_ENTITY), preset_tls_manager.fetch_delegations
     )
 
-    with pytest.raises(TLSCriticalError):
-        await manager.fetch_delegations()
-
-    assert request.called
-
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.order(200)
-async def test_register_tls(new_tls_manager: TLSManager):
+async def test_register_tls(new_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test successful registration process at the TLS."""
     manager = new_tls_manager
     tms_config = manager.config.tms_config
 
-    request = respx.post(f"{tls_prefix}/TMS?{urlencode({'host':tms_config.host})}").mock(
+    request = respx_mock.post(f"{tls_prefix}/TMS?{host_query}").mock(
         Response(
             status_code=HTTPStatus.CREATED,
             json={"id": 1, "active": True, "host": tms_config.host, "token": "token"},
@@ -102,48 +103,31 @@ async def test_register_tls(new_tls_manager: TLSManager):
     assert tms_config.active is True
 
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.parametrize("status_code", {HTTPStatus.BAD_REQUEST, HTTPStatus.CONFLICT, HTTPStatus.UNPROCESSABLE_ENTITY})
-@pytest.mark.order(200)
-async def test_register_tls_invalid(status_code: int, new_tls_manager: TLSManager):
+async def test_register_tls_invalid(new_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test registration with critical exits."""
-    manager = new_tls_manager
-    tms_config = manager.config.tms_config
-
-    request = respx.post(f"{tls_prefix}/TMS?{urlencode({'host':tms_config.host})}").mock(
-        Response(
-            status_code=status_code,
-            json={},
-        )
+    route = respx_mock.post(f"{tls_prefix}/TMS?{host_query}")
+    await expect_critical_error(
+        route, (HTTPStatus.BAD_REQUEST, HTTPStatus.CONFLICT, HTTPStatus.UNPROCESSABLE_ENTITY), new_tls_manager.register
     )
 
-    with pytest.raises(TLSCriticalError):
-        await manager.register()
 
-    assert request.called
-
-
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.order(200)
-async def test_sync_tls_config(preset_tls_manager: TLSManager):
+async def test_sync_tls_config(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test successful TMS detail synchronization."""
     manager = preset_tls_manager
     tms_config = manager.config.tms_config
 
-    validation_request = respx.get(f"{tls_prefix}/TMS/{tms_config.id}/validate_token").mock(
+    validation_request = respx_mock.get(f"{tls_prefix}/TMS/{tms_config.id}/validate_token").mock(
         Response(status_code=HTTPStatus.OK, json="")
     )
 
-    get_request = respx.get(f"{tls_prefix}/TMS/{tms_config.id}").mock(
+    get_request = respx_mock.get(f"{tls_prefix}/TMS/{tms_config.id}").mock(
         Response(
             status_code=HTTPStatus.OK,
             json={"id": tms_config.id, "active": True, "host": "old.host"},
         )
     )
 
-    put_request = respx.put(f"{tls_prefix}/TMS/{tms_config.id}?{urlencode({'host':tms_config.host})}").mock(
+    put_request = respx_mock.put(f"{tls_prefix}/TMS/{tms_config.id}?{host_query}").mock(
         Response(
             status_code=HTTPStatus.OK,
             json={"id": tms_config.id, "active": True, "host": tms_config.host},
@@ -159,15 +143,12 @@ async def test_sync_tls_config(preset_tls_manager: TLSManager):
     assert tms_config.active is True
 
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.order(200)
-async def test_sync_tls_config_deactivated(preset_tls_manager: TLSManager):
+async def test_sync_tls_config_deactivated(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
     """Test config synchronization when TLS responds with a deactivated status."""
     manager = preset_tls_manager
     tms_config = manager.config.tms_config
 
-    request = respx.get(f"{tls_prefix}/TMS/{tms_config.id}").mock(
+    request = respx_mock.get(f"{tls_prefix}/TMS/{tms_config.id}").mock(
         Response(
             status_code=HTTPStatus.OK,
             json={"id": tms_config.id, "active": False, "host": tms_config.host},
@@ -180,8 +161,6 @@ async def test_sync_tls_config_deactivated(preset_tls_manager: TLSManager):
     assert request.called
 
 
-@pytest.mark.asyncio
-@pytest.mark.order(200)
 async def test_sync_tls_invalid_config(new_tls_manager: TLSManager):
     """Assert fail when used with invalid configuration."""
     manager = new_tls_manager
@@ -190,28 +169,44 @@ async def test_sync_tls_invalid_config(new_tls_manager: TLSManager):
         await manager.sync_tls_config()
 
 
-@respx.mock
-@pytest.mark.asyncio
-@pytest.mark.parametrize("status_code", {HTTPStatus.BAD_REQUEST, HTTPStatus.CONFLICT, HTTPStatus.UNPROCESSABLE_ENTITY})
-@pytest.mark.parametrize("path", {True, False})
-@pytest.mark.order(200)
-async def test_sync_tls_invalid_responses(status_code: int, path: bool, preset_tls_manager: TLSManager):
+@pytest.fixture(scope="module")
+def tms_sync_router() -> respx.MockRouter:
+    """Fixture which returns a router containing the TMS synchronization routes, shared across test cases."""
+    router = respx.MockRouter(assert_all_called=False)
+    router.get(f"{tls_prefix}/TMS/1/validate_token", name="validate_token").mock(
+        Response(status_code=HTTPStatus.OK, json="")
+    )
+    router.get(f"{tls_prefix}/TMS/1", name="get_tms")
+    router.put(f"{tls_prefix}/TMS/1?{host_query}", name="update_tms")
+    return router
+
+
+@pytest.fixture(scope="function")
+def tms_sync_mock(tms_sync_router: respx.MockRouter) -> Generator[respx.MockRouter, Any, None]:
+    """Fixture which activates the shared TMS synchronization routes for a single test."""
+    tms_sync_router.start()
+    yield tms_sync_router
+    # Keep the routes for subsequent tests, only reset call statistics
+    tms_sync_router.stop(clear=False, reset=True)
+
+
+@pytest.mark.parametrize("status_code", (HTTPStatus.BAD_REQUEST, HTTPStatus.CONFLICT, HTTPStatus.UNPROCESSABLE_ENTITY))
+@pytest.mark.parametrize("path", (True, False))
+async def test_sync_tls_invalid_responses(
+    status_code: int, path: bool, preset_tls_manager: TLSManager, tms_sync_mock: respx.MockRouter
+):
     """Assert critical error with invalid responses."""
     manager = preset_tls_manager
     tms_config = manager.config.tms_config
 
-    validation_request = respx.get(f"{tls_prefix}/TMS/{tms_config.id}/validate_token").mock(
-        Response(status_code=HTTPStatus.OK, json="")
-    )
-
-    respx.get(f"{tls_prefix}/TMS/{tms_config.id}").mock(
+    tms_sync_mock["get_tms"].mock(
         Response(
             status_code=HTTPStatus.OK if path else status_code,
             json={"id": tms_config.id, "active": True, "host": "old.host"},
         )
     )
 
-    respx.put(f"{tls_prefix}/TMS/{tms_config.id}?{urlencode({'host':tms_config.host})}").mock(
+    tms_sync_mock["update_tms"].mock(
         Response(
             status_code=HTTPStatus.OK if not path else status_code,
             json={"id": tms_config.id, "active": True, "host": tms_config.host},
@@ -222,4 +217,120 @@ async def test_sync_tls_invalid_responses(status_code: int, path: bool, preset_t
         await manager.sync_tls_config()
 
     if path:
-        assert validation_request.called
+        assert tms_sync_mock["validate_token"].called
+
+
+async def test_publish_trixel_map_entries_circuit_breaker(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
+    """Assert that trixel map updates fail fast once the TLS is considered unavailable."""
+    manager = preset_tls_manager
+
+    request = respx_mock.put(url__startswith=f"{tls_prefix}/trixel/sensor_count/").mock(side_effect=ConnectError)
+
+    for _ in range(CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(TLSError):
+            await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+    assert request.call_count == CIRCUIT_BREAKER_FAILURE_THRESHOLD
+
+    with pytest.raises(TLSError):
+        await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+    assert request.call_count == CIRCUIT_BREAKER_FAILURE_THRESHOLD
+
+
+async def open_circuit(manager: TLSManager, request: respx.Route) -> None:
+    """
+    Open the circuit breaker of the manager and let its reset timeout pass, which allows a single probe request.
+
+    :param manager: the TLS manager whose circuit breaker is opened
+    :param request: the mocked trixel map update route
+    """
+    request.mock(side_effect=ConnectError)
+    for _ in range(CIRCUIT_BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(TLSError):
+            await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+
+    # Pretend the reset timeout has passed
+    manager._circuit_open_until = time.monotonic()
+    request.reset()
+
+
+@pytest.mark.parametrize(
+    "status_code,expected_exception",
+    (
+        pytest.param(HTTPStatus.OK, None, id="success"),
+        pytest.param(HTTPStatus.UNPROCESSABLE_ENTITY, TLSError, id="rejected"),
+    ),
+)
+async def test_publish_trixel_map_entries_circuit_breaker_probe_closes(
+    status_code: HTTPStatus,
+    expected_exception: type[Exception] | None,
+    preset_tls_manager: TLSManager,
+    respx_mock: respx.MockRouter,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Assert that the circuit breaker closes once the TLS responds to a probe without a server error."""
+    manager = preset_tls_manager
+    # The content of the response is irrelevant for the circuit breaker
+    monkeypatch.setattr(batch_update_trixel_map_entry, "_parse_response", lambda **_: None)
+
+    request = respx_mock.put(url__startswith=f"{tls_prefix}/trixel/sensor_count/")
+    await open_circuit(manager, request)
+
+    request.mock(side_effect=None, return_value=Response(status_code=status_code, json={}))
+    for call_count in (1, 2):
+        if expected_exception is None:
+            await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+        else:
+            with pytest.raises(expected_exception):
+                await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+        assert request.call_count == call_count
+
+
+@pytest.mark.parametrize(
+    "side_effect,return_value",
+    (
+        pytest.param(ConnectError, None, id="unreachable"),
+        pytest.param(None, Response(status_code=HTTPStatus.SERVICE_UNAVAILABLE, json={}), id="server_error"),
+    ),
+)
+async def test_publish_trixel_map_entries_circuit_breaker_probe_reopens(
+    side_effect: type[Exception] | None,
+    return_value: Response | None,
+    preset_tls_manager: TLSManager,
+    respx_mock: respx.MockRouter,
+):
+    """Assert that the circuit breaker re-opens if the probe fails due to an unavailable TLS."""
+    manager = preset_tls_manager
+
+    request = respx_mock.put(url__startswith=f"{tls_prefix}/trixel/sensor_count/")
+    await open_circuit(manager, request)
+
+    request.mock(side_effect=side_effect, return_value=return_value)
+    with pytest.raises(TLSError):
+        await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+    assert request.call_count == 1
+
+    with pytest.raises(TLSError):
+        await manager.publish_trixel_map_entries(type_=MeasurementTypeEnum.AMBIENT_TEMPERATURE, updates={8: 1})
+    assert request.call_count == 1
+
+
+async def test_get_trixel_map_overview(preset_tls_manager: TLSManager, respx_mock: respx.MockRouter):
+    """Test trixel map overview retrieval, which always reflects the current state at the TLS."""
+    manager = preset_tls_manager
+    delegations = manager.config.tms_config.delegations
+
+    request = respx_mock.get(url__regex=rf"{tls_prefix}/trixel/\d+").mock(
+        return_value=Response(status_code=HTTPStatus.OK, json=[32])
+    )
+
+    overview = await manager.get_trixel_map_overview()
+    assert request.call_count == len(MeasurementTypeEnum) * len(delegations)
+    for type_ in MeasurementTypeEnum:
+        assert overview[type_] == frozenset({32})
+
+    # Overviews are not cached, changes at the TLS are visible immediately
+    request.mock(return_value=Response(status_code=HTTPStatus.OK, json=[33]))
+    overview = await manager.get_trixel_map_overview()
+    assert request.call_count == 2 * len(MeasurementTypeEnum) * len(delegations)
+    for type_ in MeasurementTypeEnum:
+        assert overview[type_] == frozenset({33})